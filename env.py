@@ -0,0 +1,14 @@
+# env.py - Single place that reads .env and caches the API key
+
+import os
+from dotenv import load_dotenv
+
+_api_key = None
+
+def api_key():
+    """Return the Home Assistant API key, parsing .env only on first use"""
+    global _api_key
+    if _api_key is None:
+        load_dotenv()
+        _api_key = os.getenv("API_KEY")
+    return _api_key
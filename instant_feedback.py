@@ -1,475 +1,579 @@
 # instant_feedback.py - Complete ultra-fast LED feedback system
 
+import logging
+import queue
 import time
+import mido
+from logging.handlers import QueueHandler, QueueListener
 from dataclasses import dataclass
+from functools import cached_property
 from pymidicontroller.classes.controller import ControllerExtension
+from pymidicontroller.extensions import homeassistant
+
+# Hot paths measure intervals, so bind the monotonic clock once: it is
+# cheaper than time.time() and immune to wall-clock jumps
+_monotonic = time.monotonic
+
+# Lazy %s-style logging keeps formatting off the hot path entirely when
+# the level is disabled
+logger = logging.getLogger(__name__)
+
+def setup_async_logging(level=logging.INFO):
+    """Route log output through a background thread.
+
+    Hot paths then only enqueue records; the QueueListener thread does
+    the formatting and the stdout write, so a slow terminal can never
+    block a MIDI callback. Idempotent - safe to call from every entry
+    script."""
+    root = logging.getLogger()
+    if any(isinstance(handler, QueueHandler) for handler in root.handlers):
+        return
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(message)s'))
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+
+# The switch log lines only need second resolution, so cache the
+# formatted timestamp per second instead of calling strftime (locale
+# lookup + allocation) on every MIDI event
+_ts_cache = (0, '')
+
+def _timestamp():
+    global _ts_cache
+    now = int(time.time())
+    if now != _ts_cache[0]:
+        _ts_cache = (now, time.strftime('%H:%M:%S'))
+    return _ts_cache[1]
+
+# LED color → velocity values (Launch Control XL manual, page 4)
+COLOR_MAP = {
+    'red': 15,      # Off state
+    'amber': 63,    # Pending/transitioning state
+    'green': 60,    # On state
+    'yellow': 62,   # Alternative pending color
+    'off': 0        # LED completely off
+}
+
+# LED transition tables for the state machine in execute(): keyed on
+# (pending_change, entity is on) so one lookup replaces the branch chains
+TRANSITIONS = {
+    (True, True): ('green', 'confirmed ON'),
+    (True, False): ('red', 'confirmed OFF'),
+    (False, True): ('green', 'external change - ON'),
+    (False, False): ('red', 'external change - OFF'),
+}
+TIMEOUT_REVERT = {
+    True: ('green', 'timeout - reverting to ON'),
+    False: ('red', 'timeout - reverting to OFF'),
+}
+INITIAL_STATE = {
+    True: ('green', 'initial state - ON'),
+    False: ('red', 'initial state - OFF'),
+}
 
 @dataclass
-class InstantFeedbackLight(ControllerExtension):
-    """Advanced feedback system with ultra-fast visual response"""
+class _InstantFeedbackBase(ControllerExtension):
+    """Shared LED feedback state machine for switches and lights.
+
+    The switch and light variants behave identically - only the log
+    wording differs - so the whole implementation lives here and the
+    subclasses just override the label class attributes."""
     entity_id: str = None
     client: object = None
     midi_channel: int = 1
     midi_note: int = None
     controller_device: object = None
+    state_cache: object = None
+
+    # How often execute() checks state - fixed after construction, so a
+    # class attribute instead of a metadata entry
+    update_frequency = 0.1
+
+    # Log wording - overridden by subclasses
+    _press_label = '🎵 Button pressed:'
+    _confirm_label = '✅ State change confirmed:'
+    _external_label = '🔄 External change:'
+    _initial_label = '🔧 Initial state:'
 
     def __post_init__(self):
         super().__post_init__()
         if self.client is None:
-            import sys; sys.exit('No client registered for InstantFeedbackLight')
+            import sys; sys.exit(f'No client registered for {type(self).__name__}')
         if self.controller_device is None:
-            import sys; sys.exit('No controller device registered for InstantFeedbackLight')
+            import sys; sys.exit(f'No controller device registered for {type(self).__name__}')
         if self.midi_note is None:
-            import sys; sys.exit('No MIDI Note specified for InstantFeedbackLight')
-        
-        self.set_metadata('update_frequency', 0.1)  # Check state frequently
-        self.set_metadata('last_ha_state', None)
-        self.set_metadata('last_check_time', 0)
-        self.set_metadata('pending_change', False)
-        self.set_metadata('pending_start_time', 0)
-        self.set_metadata('current_led_color', 'unknown')
-
-    def _get_velocity_for_color(self, color):
-        """Get velocity values for different LED colors"""
-        color_map = {
-            'red': 15,      # Off state
-            'amber': 63,    # Pending/transitioning state  
-            'green': 60,    # On state
-            'yellow': 62,   # Alternative pending color
-            'off': 0        # LED completely off
+            import sys; sys.exit(f'No MIDI Note specified for {type(self).__name__}')
+
+        self.set_metadata('update_frequency', self.update_frequency)  # Framework throttle (invoke)
+
+        # Hot-path state lives in plain attributes - execute() runs every
+        # few milliseconds and attribute loads are much cheaper than the
+        # metadata dict lookups
+        self.last_ha_state = None
+        self.last_check_time = 0
+        self.pending_change = False
+        self.pending_start_time = 0
+        self.current_led_color = 'unknown'
+        self._idle_interval = self.update_frequency  # Grows while nothing changes
+        self._last_midi_fail = -1.0
+
+        # Read states through the shared cache when one is provided so
+        # multiple feedback instances don't each poll Home Assistant
+        self._get_state = self.state_cache.get if self.state_cache else self.client.get_state
+
+        # Bind the send strategy once: the controller's queue_led path is
+        # a plain dict store that cannot raise, so the hot path runs with
+        # no try/except at all - I/O errors surface on the sender thread.
+        # Direct sends keep their own guarded slow path.
+        queue_led = getattr(self.controller_device, 'queue_led', None)
+        if queue_led is not None:
+            self._queue_led = queue_led
+            self._send = self._send_queued
+        else:
+            self._send = self._send_direct
+
+    @cached_property
+    def _led_msgs(self):
+        """One MIDI message per color so the hot path never constructs
+        a Message object - channel and note never change after init"""
+        return {
+            color: mido.Message('note_on' if velocity > 0 else 'note_off',
+                                channel=self.midi_channel-1,
+                                note=self.midi_note,
+                                velocity=velocity)
+            for color, velocity in COLOR_MAP.items()
+        }
+
+    @cached_property
+    def _raw_msgs(self):
+        """Raw 3-byte payloads for the rtmidi fast path - sending these
+        straight through port._rt.send_message skips mido's Message
+        packing and validation on every LED update"""
+        return {
+            color: bytes([(0x90 if velocity > 0 else 0x80) | (self.midi_channel - 1),
+                          self.midi_note,
+                          velocity])
+            for color, velocity in COLOR_MAP.items()
         }
-        return color_map.get(color, 0)
+
+    def _send_queued(self, color, msg):
+        """Hand the message to the controller's LED buffer - pure dict
+        store, nothing to catch"""
+        self._queue_led(msg)
+        return True
+
+    def _send_direct(self, color, msg):
+        """Fallback for controllers without an LED buffer: send inline
+        with failure backoff"""
+        # After a send failure, back off for a second instead of raising
+        # (and swallowing) against a dead port on every tick
+        if _monotonic() - self._last_midi_fail < 1.0:
+            return False
+
+        output_device = self.controller_device.output_device
+        if output_device is None:
+            return False
+
+        try:
+            # rtmidi backend exposes the underlying port - write the
+            # precomputed raw bytes and skip mido's packing
+            rt_port = getattr(output_device, '_rt', None)
+            if rt_port is not None:
+                rt_port.send_message(self._raw_msgs[color])
+            else:
+                output_device.send(msg)
+            return True
+        except OSError as e:
+            # Most likely the controller was unplugged - note it and let
+            # the backoff above keep the hot path cheap until it returns
+            self._last_midi_fail = _monotonic()
+            logger.warning("⚠️  MIDI send failed for %s: %s", self.entity_id, e)
+            return False
 
     def _set_led_color(self, color, reason=""):
         """Set LED to specific color with ultra-fast execution"""
-        velocity = self._get_velocity_for_color(color)
-        
-        # Send MIDI immediately without any error checking delays
-        try:
-            if self.controller_device.output_device:
-                if velocity > 0:
-                    msg_type = 'note_on'
-                    import mido
-                    msg = mido.Message(msg_type, channel=self.midi_channel-1, note=self.midi_note, velocity=velocity)
-                else:
-                    msg_type = 'note_off'
-                    import mido
-                    msg = mido.Message(msg_type, channel=self.midi_channel-1, note=self.midi_note, velocity=0)
-                
-                self.controller_device.output_device.send(msg)
-                self.set_metadata('current_led_color', color)
-                
-                if reason:
-                    print(f"💡 LED → {color.upper()}: {self.entity_id} ({reason})")
-                return True
-        except:
-            # Don't let MIDI errors slow us down
-            pass
-        
-        return False
+        # Skip redundant writes - the LED is already showing this color
+        if color == self.current_led_color:
+            return True
+
+        msg = self._led_msgs.get(color)
+        if msg is None or not self._send(color, msg):
+            return False
+        self.current_led_color = color
+
+        if reason:
+            logger.debug("💡 LED → %s: %s (%s)", color.upper(), self.entity_id, reason)
+        return True
 
     def button_pressed(self):
         """Called when button is pressed - provides ULTRA-FAST feedback"""
-        
+
         # FIRST: Set LED to amber IMMEDIATELY (no state checking delays)
         self._set_led_color('amber', 'INSTANT button response')
-        
+
         # SECOND: Mark pending and get current state
-        self.set_metadata('pending_change', True)
-        self.set_metadata('pending_start_time', time.time())
-        
+        self.pending_change = True
+        self.pending_start_time = _monotonic()
+
+        # Force the next tick to re-check immediately instead of waiting
+        # out the remainder of the current throttle window
+        self.last_check_time = 0
+        self.set_metadata('last_exec_time', 0)
+
         # THIRD: Check what state we're transitioning from/to (for logging only)
         try:
-            current_ha_state = self.client.get_state(self.entity_id)
+            current_ha_state = self._get_state(self.entity_id)
             if current_ha_state == 'on':
-                print(f"🎵 Button pressed: {self.entity_id} ON → transitioning to OFF")
+                logger.info("%s %s ON → transitioning to OFF", self._press_label, self.entity_id)
             else:
-                print(f"🎵 Button pressed: {self.entity_id} OFF → transitioning to ON")
+                logger.info("%s %s OFF → transitioning to ON", self._press_label, self.entity_id)
         except:
             # If state check fails, don't let it slow down the LED response
-            print(f"🎵 Button pressed: {self.entity_id} → transitioning (state unknown)")
+            logger.info("%s %s → transitioning (state unknown)", self._press_label, self.entity_id)
             pass
 
+    def on_state_change(self, new_state):
+        """Push-path entry point: apply a state change delivered by the
+        WebSocket listener instead of waiting for the next poll"""
+        if new_state is None or new_state == self.last_ha_state:
+            return
+
+        self._set_led_color(*TRANSITIONS[(self.pending_change, new_state == 'on')])
+
+        if self.pending_change:
+            self.pending_change = False
+            logger.info("%s %s = %s", self._confirm_label, self.entity_id, new_state.upper())
+        else:
+            logger.info("%s %s = %s", self._external_label, self.entity_id, new_state.upper())
+
+        self.last_ha_state = new_state
+
     def execute(self):
-        current_time = time.time()
-        last_check = self.get_metadata('last_check_time')
-        
-        # Check state more frequently when pending change
-        check_interval = 0.05 if self.get_metadata('pending_change') else self.get_metadata('update_frequency')
-        
-        if current_time - last_check < check_interval:
+        current_time = _monotonic()
+
+        # Check state more frequently when pending change; idle polling
+        # backs off exponentially while nothing changes
+        check_interval = 0.05 if self.pending_change else self._idle_interval
+
+        if current_time - self.last_check_time < check_interval:
             return False
-        
+
         try:
-            current_ha_state = self.client.get_state(self.entity_id)
-            last_ha_state = self.get_metadata('last_ha_state')
-            pending_change = self.get_metadata('pending_change')
-            current_led_color = self.get_metadata('current_led_color')
-            
+            current_ha_state = self._get_state(self.entity_id)
+            last_ha_state = self.last_ha_state
+            pending_change = self.pending_change
+
             # Handle state change detection
             if current_ha_state != last_ha_state and current_ha_state is not None:
+                self._idle_interval = self.update_frequency
+                self._set_led_color(*TRANSITIONS[(pending_change, current_ha_state == 'on')])
+
                 if pending_change:
-                    # State changed as expected - show final color
-                    if current_ha_state == 'on':
-                        self._set_led_color('green', 'confirmed ON')
-                    else:
-                        self._set_led_color('red', 'confirmed OFF')
-                    
-                    self.set_metadata('pending_change', False)
-                    print(f"✅ State change confirmed: {self.entity_id} = {current_ha_state.upper()}")
-                    
+                    self.pending_change = False
+                    logger.info("%s %s = %s", self._confirm_label, self.entity_id, current_ha_state.upper())
                 else:
-                    # State changed without button press (external change)
-                    if current_ha_state == 'on':
-                        self._set_led_color('green', 'external change - ON')
-                    else:
-                        self._set_led_color('red', 'external change - OFF')
-                    
-                    print(f"🔄 External change: {self.entity_id} = {current_ha_state.upper()}")
-                
-                self.set_metadata('last_ha_state', current_ha_state)
-            
+                    logger.info("%s %s = %s", self._external_label, self.entity_id, current_ha_state.upper())
+
+                self.last_ha_state = current_ha_state
+
             # Handle timeout for pending changes (in case HA doesn't respond)
             elif pending_change:
-                pending_duration = current_time - self.get_metadata('pending_start_time')
+                pending_duration = current_time - self.pending_start_time
                 if pending_duration > 3.0:  # 3 second timeout
-                    print(f"⚠️  Timeout waiting for {self.entity_id} state change - reverting LED")
+                    logger.warning("⚠️  Timeout waiting for %s state change - reverting LED", self.entity_id)
                     # Revert to actual state
-                    if current_ha_state == 'on':
-                        self._set_led_color('green', 'timeout - reverting to ON')
-                    else:
-                        self._set_led_color('red', 'timeout - reverting to OFF')
-                    
-                    self.set_metadata('pending_change', False)
-            
+                    self._set_led_color(*TIMEOUT_REVERT[current_ha_state == 'on'])
+                    self.pending_change = False
+
             # Initial state setup (first run)
             elif last_ha_state is None and current_ha_state is not None:
-                if current_ha_state == 'on':
-                    self._set_led_color('green', 'initial state - ON')
-                else:
-                    self._set_led_color('red', 'initial state - OFF')
-                
-                self.set_metadata('last_ha_state', current_ha_state)
-                print(f"🔧 Initial state: {self.entity_id} = {current_ha_state.upper()}")
-            
-            self.set_metadata('last_check_time', current_time)
-            
+                self._set_led_color(*INITIAL_STATE[current_ha_state == 'on'])
+                self.last_ha_state = current_ha_state
+                logger.info("%s %s = %s", self._initial_label, self.entity_id, current_ha_state.upper())
+
+            # Nothing changed - back off the idle poll rate
+            else:
+                self._idle_interval = min(self._idle_interval * 1.5, 2.0)
+
+            self.last_check_time = current_time
+
         except Exception as e:
-            print(f"❌ Error in InstantFeedbackLight for {self.entity_id}: {e}")
-            self.set_metadata('last_check_time', current_time)
-        
+            logger.error("❌ Error in %s for %s: %s", type(self).__name__, self.entity_id, e)
+            self.last_check_time = current_time
+
         return False
 
-# Enhanced feedback system for both switches and lights
+@dataclass
+class InstantFeedbackLight(_InstantFeedbackBase):
+    """Advanced feedback system with ultra-fast visual response"""
 
 @dataclass
-class InstantLightToggle(ControllerExtension):
+class InstantLightToggle(_InstantFeedbackBase):
     """Light toggle with ultra-fast LED feedback - same behavior as switches"""
-    entity_id: str = None
+    _press_label = '💡 Light button pressed:'
+    _confirm_label = '✅ Light state confirmed:'
+    _external_label = '🔄 External light change:'
+    _initial_label = '🔧 Initial light state:'
+
+@dataclass
+class FeedbackBank(ControllerExtension):
+    """Aggregates many feedback LEDs into one extension.
+
+    Instead of one object (and one execute() call, one metadata dict,
+    one state read) per LED, the bank keeps per-LED state in parallel
+    lists and walks them in a single tight loop per tick. add() returns
+    the press callback to hand to the switch for that entity. Opt-in
+    alternative to registering individual feedback instances."""
     client: object = None
-    midi_channel: int = 1
-    midi_note: int = None
     controller_device: object = None
+    state_cache: object = None
+
+    update_frequency = 0.05
 
     def __post_init__(self):
         super().__post_init__()
         if self.client is None:
-            import sys; sys.exit('No client registered for InstantLightToggle')
+            import sys; sys.exit('No client registered for FeedbackBank')
         if self.controller_device is None:
-            import sys; sys.exit('No controller device registered for InstantLightToggle')
-        if self.midi_note is None:
-            import sys; sys.exit('No MIDI Note specified for InstantLightToggle')
-        
-        self.set_metadata('update_frequency', 0.1)
-        self.set_metadata('last_ha_state', None)
-        self.set_metadata('last_check_time', 0)
-        self.set_metadata('pending_change', False)
-        self.set_metadata('pending_start_time', 0)
-        self.set_metadata('current_led_color', 'unknown')
-
-    def _get_velocity_for_color(self, color):
-        """Get velocity values for different LED colors"""
-        color_map = {
-            'red': 15,      # Off state
-            'amber': 63,    # Pending/transitioning state  
-            'green': 60,    # On state
-            'yellow': 62,   # Alternative pending color
-            'off': 0        # LED completely off
-        }
-        return color_map.get(color, 0)
+            import sys; sys.exit('No controller device registered for FeedbackBank')
+
+        self.set_metadata('update_frequency', self.update_frequency)
+
+        # Parallel per-LED lists - index i describes one button/LED pair
+        self.entities = []
+        self.last_states = []     # None until first successful read
+        self.pending = []         # True between press and confirmation
+        self.pending_since = []   # monotonic press timestamp
+        self.colors = []          # color currently shown on the LED
+        self._color_msgs = []     # {color: prebuilt Message} per LED
+
+        self._get_state = self.state_cache.get if self.state_cache else self.client.get_state
+
+    def add(self, entity_id, channel, note):
+        """Register one LED; returns the press callback for its switch"""
+        index = len(self.entities)
+        self.entities.append(entity_id)
+        self.last_states.append(None)
+        self.pending.append(False)
+        self.pending_since.append(0.0)
+        self.colors.append('unknown')
+        self._color_msgs.append({
+            color: mido.Message('note_on' if velocity > 0 else 'note_off',
+                                channel=channel-1, note=note, velocity=velocity)
+            for color, velocity in COLOR_MAP.items()
+        })
+        return lambda: self._pressed(index)
+
+    def _pressed(self, index):
+        """Instant amber on press; confirmation happens on the next tick"""
+        self._show(index, 'amber')
+        self.pending[index] = True
+        self.pending_since[index] = _monotonic()
+        self.set_metadata('last_exec_time', 0)
+
+    def _show(self, index, color):
+        if self.colors[index] == color:
+            return
+        self.controller_device.queue_led(self._color_msgs[index][color])
+        self.colors[index] = color
+
+    def execute(self):
+        now = _monotonic()
+
+        # Bind everything the loop touches to locals - this body runs
+        # len(entities) times per tick
+        get_state = self._get_state
+        entities = self.entities
+        last_states = self.last_states
+        pending = self.pending
+        pending_since = self.pending_since
+        show = self._show
+
+        for i in range(len(entities)):
+            state = get_state(entities[i])
+            if state is None:
+                continue
+
+            if state != last_states[i]:
+                show(i, 'green' if state == 'on' else 'red')
+                if pending[i]:
+                    pending[i] = False
+                    logger.info("✅ State change confirmed: %s = %s", entities[i], state.upper())
+                elif last_states[i] is not None:
+                    logger.info("🔄 External change: %s = %s", entities[i], state.upper())
+                last_states[i] = state
+
+            elif pending[i] and now - pending_since[i] > 3.0:
+                logger.warning("⚠️  Timeout waiting for %s state change - reverting LED", entities[i])
+                show(i, 'green' if state == 'on' else 'red')
+                pending[i] = False
 
-    def _set_led_color(self, color, reason=""):
-        """Set LED to specific color with ultra-fast execution"""
-        velocity = self._get_velocity_for_color(color)
-        
-        try:
-            if self.controller_device.output_device:
-                if velocity > 0:
-                    msg_type = 'note_on'
-                    import mido
-                    msg = mido.Message(msg_type, channel=self.midi_channel-1, note=self.midi_note, velocity=velocity)
-                else:
-                    msg_type = 'note_off'
-                    import mido
-                    msg = mido.Message(msg_type, channel=self.midi_channel-1, note=self.midi_note, velocity=0)
-                
-                self.controller_device.output_device.send(msg)
-                self.set_metadata('current_led_color', color)
-                
-                if reason:
-                    print(f"💡 LED → {color.upper()}: {self.entity_id} ({reason})")
-                return True
-        except:
-            pass
-        
         return False
 
-    def button_pressed(self):
-        """Called when button is pressed - provides ULTRA-FAST feedback for lights"""
-        
-        # FIRST: Set LED to amber IMMEDIATELY
-        self._set_led_color('amber', 'INSTANT button response')
-        
-        # SECOND: Mark pending and get current state
-        self.set_metadata('pending_change', True)
-        self.set_metadata('pending_start_time', time.time())
-        
-        # THIRD: Check what state we're transitioning from/to
-        try:
-            current_ha_state = self.client.get_state(self.entity_id)
-            if current_ha_state == 'on':
-                print(f"💡 Light button pressed: {self.entity_id} ON → transitioning to OFF")
-            else:
-                print(f"💡 Light button pressed: {self.entity_id} OFF → transitioning to ON")
-        except:
-            print(f"💡 Light button pressed: {self.entity_id} → transitioning (state unknown)")
-            pass
+# Defined once at module scope - rebuilding these classes inside
+# _create_switch re-executed the class body for every switch created
+class LightToggleSwitch(ControllerExtension):
+    """Toggle switch for lights that fires the LED feedback callback first"""
+
+    def __init__(self, entity_id, client, feedback_callback=None):
+        super().__init__()
+        self.entity_id = entity_id
+        self.client = client
+        self.feedback_callback = feedback_callback
+        self.set_metadata('update_frequency', 0.001)
+        self.set_attribute('last_note_state', 0)
+
+    def update(self, attribute, value):
+        timestamp = _timestamp()
+
+        if value > 0:  # Button pressed
+            logger.info("[%s] 🎵 LIGHT PRESSED: %s", timestamp, self.entity_id)
+
+            # Trigger instant LED feedback IMMEDIATELY
+            if self.feedback_callback:
+                self.feedback_callback()
+
+            # Set flag for toggle action
+            last_state = self.get_attribute('last_note_state') or 0
+            if last_state == 0:  # Only on press, not release
+                self.set_metadata('post_flag', True)
+
+        else:  # Button released
+            logger.info("[%s] 🎵 LIGHT RELEASED: %s", timestamp, self.entity_id)
+
+        self.set_attribute('last_note_state', value)
+        return super().update(attribute, value)
 
     def execute(self):
-        current_time = time.time()
-        last_check = self.get_metadata('last_check_time')
-        
-        # Check state more frequently when pending change
-        check_interval = 0.05 if self.get_metadata('pending_change') else self.get_metadata('update_frequency')
-        
-        if current_time - last_check < check_interval:
-            return False
-        
-        try:
-            current_ha_state = self.client.get_state(self.entity_id)
-            last_ha_state = self.get_metadata('last_ha_state')
-            pending_change = self.get_metadata('pending_change')
-            
-            # Handle state change detection
-            if current_ha_state != last_ha_state and current_ha_state is not None:
-                if pending_change:
-                    # State changed as expected - show final color
-                    if current_ha_state == 'on':
-                        self._set_led_color('green', 'confirmed ON')
-                    else:
-                        self._set_led_color('red', 'confirmed OFF')
-                    
-                    self.set_metadata('pending_change', False)
-                    print(f"✅ Light state confirmed: {self.entity_id} = {current_ha_state.upper()}")
-                    
-                else:
-                    # State changed without button press (external change)
-                    if current_ha_state == 'on':
-                        self._set_led_color('green', 'external change - ON')
-                    else:
-                        self._set_led_color('red', 'external change - OFF')
-                    
-                    print(f"🔄 External light change: {self.entity_id} = {current_ha_state.upper()}")
-                
-                self.set_metadata('last_ha_state', current_ha_state)
-            
-            # Handle timeout for pending changes
-            elif pending_change:
-                pending_duration = current_time - self.get_metadata('pending_start_time')
-                if pending_duration > 3.0:  # 3 second timeout
-                    print(f"⚠️  Timeout waiting for {self.entity_id} state change - reverting LED")
-                    if current_ha_state == 'on':
-                        self._set_led_color('green', 'timeout - reverting to ON')
-                    else:
-                        self._set_led_color('red', 'timeout - reverting to OFF')
-                    
-                    self.set_metadata('pending_change', False)
-            
-            # Initial state setup (first run)
-            elif last_ha_state is None and current_ha_state is not None:
-                if current_ha_state == 'on':
-                    self._set_led_color('green', 'initial state - ON')
-                else:
-                    self._set_led_color('red', 'initial state - OFF')
-                
-                self.set_metadata('last_ha_state', current_ha_state)
-                print(f"🔧 Initial light state: {self.entity_id} = {current_ha_state.upper()}")
-            
-            self.set_metadata('last_check_time', current_time)
-            
-        except Exception as e:
-            print(f"❌ Error in InstantLightToggle for {self.entity_id}: {e}")
-            self.set_metadata('last_check_time', current_time)
-        
+        if self.get_metadata('post_flag'):
+            timestamp = _timestamp()
+            logger.info("[%s] 🔥 TOGGLING LIGHT %s", timestamp, self.entity_id)
+
+            # Toggle the light using Home Assistant API
+            data = {'entity_id': self.entity_id}
+            success = self.client.post_data(data, 'light', 'toggle')
+            self.set_metadata('post_flag', False)
+            return not success
         return False
 
 # Light toggle switch class
 class InstantLightToggleSwitch:
     """Light toggle switch that provides ultra-fast LED feedback"""
-    
+
     def __init__(self, entity_id, client, feedback_light=None):
         self.entity_id = entity_id
         self.client = client
         self.feedback_light = feedback_light
         self.switch = self._create_switch()
-    
+
     def _create_switch(self):
         """Create the underlying light toggle switch"""
-        from pymidicontroller.extensions import homeassistant
-        
-        class LightToggleSwitch(homeassistant.ControllerExtension):
-            def __init__(self, entity_id, client, feedback_callback=None):
-                super().__init__()
-                self.entity_id = entity_id
-                self.client = client
-                self.feedback_callback = feedback_callback
-                self.set_metadata('update_frequency', 0.001)
-                self.set_attribute('last_note_state', 0)
-            
-            def update(self, attribute, value):
-                timestamp = time.strftime('%H:%M:%S')
-                
-                if value > 0:  # Button pressed
-                    print(f"[{timestamp}] 🎵 LIGHT PRESSED: {self.entity_id}")
-                    
-                    # Trigger instant LED feedback IMMEDIATELY
-                    if self.feedback_callback:
-                        self.feedback_callback()
-                    
-                    # Set flag for toggle action
-                    last_state = self.get_attribute('last_note_state') or 0
-                    if last_state == 0:  # Only on press, not release
-                        self.set_metadata('post_flag', True)
-                
-                else:  # Button released
-                    print(f"[{timestamp}] 🎵 LIGHT RELEASED: {self.entity_id}")
-                
-                self.set_attribute('last_note_state', value)
-                return super().update(attribute, value)
-            
-            def execute(self):
-                if self.get_metadata('post_flag'):
-                    timestamp = time.strftime('%H:%M:%S')
-                    print(f"[{timestamp}] 🔥 TOGGLING LIGHT {self.entity_id}")
-                    
-                    # Toggle the light using Home Assistant API
-                    data = {'entity_id': self.entity_id}
-                    success = self.client.post_data(data, 'light', 'toggle')
-                    self.set_metadata('post_flag', False)
-                    return not success
-                return False
-        
-        # Create switch with feedback callback
         callback = self.feedback_light.button_pressed if self.feedback_light else None
         return LightToggleSwitch(self.entity_id, self.client, callback)
-    
+
     def get_switch(self):
         """Get the underlying switch object for registration"""
         return self.switch
 
 # Enhanced convenience function for lights
-def create_instant_light_toggle(entity_id, client, controller, channel, note):
+def create_instant_light_toggle(entity_id, client, controller, channel, note, state_cache=None):
     """Create a complete instant feedback system for a light toggle"""
-    
+
     # Create the light toggle feedback
     feedback = InstantLightToggle(
         entity_id=entity_id,
         client=client,
         midi_channel=channel,
         midi_note=note,
-        controller_device=controller
+        controller_device=controller,
+        state_cache=state_cache
     )
-    
+
     # Create the enhanced light toggle switch
     switch_system = InstantLightToggleSwitch(
         entity_id=entity_id,
         client=client,
         feedback_light=feedback
     )
-    
+
     return switch_system.get_switch(), feedback
+class EnhancedSwitch(homeassistant.Switch):
+    """Switch subclass that fires the LED feedback callback before posting"""
+
+    def __init__(self, entity_id, client, feedback_callback=None):
+        super().__init__(entity_id=entity_id, client=client)
+        self.feedback_callback = feedback_callback
+        self.set_metadata('update_frequency', 0.001)  # Ultra responsive
+
+    def update(self, attribute, value):
+        timestamp = _timestamp()
+
+        if value > 0:  # Button pressed
+            logger.info("[%s] 🎵 PRESSED: %s", timestamp, self.entity_id)
+
+            # Trigger instant LED feedback IMMEDIATELY - before ANY other processing
+            if self.feedback_callback:
+                self.feedback_callback()
+
+            # Call parent update method AFTER LED feedback
+            result = super().update(attribute, value)
+            return result
+
+        else:  # Button released
+            logger.info("[%s] 🎵 RELEASED: %s", timestamp, self.entity_id)
+            # Call parent update method
+            result = super().update(attribute, value)
+            return result
+
+    def execute(self):
+        if self.get_metadata('post_flag'):
+            timestamp = _timestamp()
+            logger.info("[%s] 🔥 TOGGLING %s", timestamp, self.entity_id)
+        result = super().execute()
+        return result
+
 class InstantResponseSwitch:
     """Switch that provides ultra-fast LED feedback on button press"""
-    
+
     def __init__(self, entity_id, client, feedback_light=None):
         self.entity_id = entity_id
         self.client = client
         self.feedback_light = feedback_light
         self.switch = self._create_switch()
-    
+
     def _create_switch(self):
         """Create the underlying switch with enhanced behavior"""
-        from pymidicontroller.extensions import homeassistant
-        
-        class EnhancedSwitch(homeassistant.Switch):
-            def __init__(self, entity_id, client, feedback_callback=None):
-                super().__init__(entity_id=entity_id, client=client)
-                self.feedback_callback = feedback_callback
-                self.set_metadata('update_frequency', 0.001)  # Ultra responsive
-            
-            def update(self, attribute, value):
-                timestamp = time.strftime('%H:%M:%S')
-                
-                if value > 0:  # Button pressed
-                    print(f"[{timestamp}] 🎵 PRESSED: {self.entity_id}")
-                    
-                    # Trigger instant LED feedback IMMEDIATELY - before ANY other processing
-                    if self.feedback_callback:
-                        self.feedback_callback()
-                    
-                    # Call parent update method AFTER LED feedback
-                    result = super().update(attribute, value)
-                    return result
-                
-                else:  # Button released
-                    print(f"[{timestamp}] 🎵 RELEASED: {self.entity_id}")
-                    # Call parent update method
-                    result = super().update(attribute, value)
-                    return result
-            
-            def execute(self):
-                if self.get_metadata('post_flag'):
-                    timestamp = time.strftime('%H:%M:%S')
-                    print(f"[{timestamp}] 🔥 TOGGLING {self.entity_id}")
-                result = super().execute()
-                return result
-        
-        # Create switch with feedback callback
         callback = self.feedback_light.button_pressed if self.feedback_light else None
         return EnhancedSwitch(self.entity_id, self.client, callback)
-    
+
     def get_switch(self):
         """Get the underlying switch object for registration"""
         return self.switch
 
 # Convenience function for easy setup
-def create_instant_feedback_system(entity_id, client, controller, channel, note):
+def create_instant_feedback_system(entity_id, client, controller, channel, note, state_cache=None):
     """Create a complete instant feedback system for a switch"""
-    
+
     # Create the feedback light
     feedback = InstantFeedbackLight(
         entity_id=entity_id,
         client=client,
         midi_channel=channel,
         midi_note=note,
-        controller_device=controller
+        controller_device=controller,
+        state_cache=state_cache
     )
-    
+
     # Create the enhanced switch with instant feedback
     switch_system = InstantResponseSwitch(
         entity_id=entity_id,
         client=client,
         feedback_light=feedback
     )
-    
-    return switch_system.get_switch(), feedback
\ No newline at end of file
+
+    return switch_system.get_switch(), feedback
@@ -1,10 +1,8 @@
 import requests
-import json
-import os
-from dotenv import load_dotenv
+import sys
+from env import api_key
 
-load_dotenv()  # loads from .env by default
-api_key = os.getenv("API_KEY")
+api_key = api_key()
 
 # Your credentials
 homeassistant_uri = "http://homeassistant.local:8123"
@@ -16,27 +14,33 @@ print("Fetching all lights...\n")
 
 response = requests.get(f'{homeassistant_uri}/api/states', headers=headers)
 if response.status_code == 200:
-    states = response.json()
-    lights = [s for s in states if s['entity_id'].startswith('light.')]
-    
-    print(f"Found {len(lights)} lights:\n")
-    
-    for light in lights:
+    # One pass over the states list: filter, format and count together,
+    # then emit everything with a single write instead of a print per line
+    out = []
+    count = 0
+    for light in response.json():
         entity_id = light['entity_id']
+        if not entity_id.startswith('light.'):
+            continue
+        count += 1
         attrs = light['attributes']
         friendly_name = attrs.get('friendly_name', 'Unknown')
-        
-        print(f"{entity_id}")
-        print(f"  Name: {friendly_name}")
-        print(f"  State: {light['state']}")
-        print(f"  Supported modes: {attrs.get('supported_color_modes', [])}")
-        print(f"  Current mode: {attrs.get('color_mode', 'N/A')}")
-        
+
+        out.append(
+            f"{entity_id}\n"
+            f"  Name: {friendly_name}\n"
+            f"  State: {light['state']}\n"
+            f"  Supported modes: {attrs.get('supported_color_modes', [])}\n"
+            f"  Current mode: {attrs.get('color_mode', 'N/A')}\n"
+        )
+
         # Check if it's a Cync light
         if 'cync' in entity_id.lower() or 'cync' in friendly_name.lower():
-            print("  *** This appears to be a Cync light ***")
-        
-        print()
+            out.append("  *** This appears to be a Cync light ***\n")
+
+        out.append("\n")
+
+    sys.stdout.write(f"Found {count} lights:\n\n" + ''.join(out))
 else:
     print(f"Error: {response.status_code}")
 
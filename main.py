@@ -3,14 +3,12 @@
 from pymidicontroller.classes.controller import Controller
 from pymidicontroller.extensions import *
 from midi_config import load_midi_config
-from instant_feedback import create_instant_feedback_system, create_instant_light_toggle
+from instant_feedback import create_instant_feedback_system, create_instant_light_toggle, setup_async_logging
 from datetime import datetime
-import os
 import time
-from dotenv import load_dotenv
+from env import api_key
 
-load_dotenv()
-api_key = os.getenv("API_KEY")
+api_key = api_key()
 
 # Load MIDI configuration
 print("🎵 Loading MIDI configuration...")
@@ -29,12 +27,23 @@ homeassistant_uri = "http://homeassistant.local:8123"
 homeassistant_token = api_key
 
 if __name__ == '__main__':
+    # Log emission happens on a background thread so the MIDI hot
+    # paths never block on stdout
+    setup_async_logging()
+
     # Create the MIDI Controller
     device = Controller()
 
     # Home Assistant integration
     homeassistant_client = homeassistant.Client(homeassistant_uri, homeassistant_token)
 
+    # Shared state cache plus the WebSocket listener: state_changed
+    # events are pushed into the cache and straight to each button's
+    # feedback handler, so LEDs react to external changes in tens of
+    # milliseconds while the polling path stays as a fallback
+    state_cache = homeassistant.StatesCache(homeassistant_client)
+    state_listener = homeassistant.StateEventListener(homeassistant_client, state_cache)
+
     # Devices - Your existing light controls
     lightbar = homeassistant.Light(entity_id='light.lightbar', client=homeassistant_client)
     tripod = homeassistant.CyncLight(entity_id='light.orange_tripod', client=homeassistant_client)
@@ -48,126 +57,79 @@ if __name__ == '__main__':
     sunroom_lightbar = homeassistant.Light(entity_id='light.sunroom_lightbar', client=homeassistant_client)
     
 
-    # Light control mappings (CC-based)
+    # Light control mappings (CC-based) - registered in one bulk call
     print("🔧 Setting up light controls...")
-    # Lightbar - HS channels
-    device.register_mapping(1, 77, lightbar, 'brightness_channel', message_type='cc')
-    device.register_mapping(1, 13, lightbar, 'hue_channel', message_type='cc')
-    device.register_mapping(1, 29, lightbar, 'saturation_channel', message_type='cc')
-
-    # Tripod (Cync light) - RGB channels
-    device.register_mapping(1, 14, tripod, 'red_channel', message_type='cc')
-    device.register_mapping(1, 30, tripod, 'green_channel', message_type='cc')
-    device.register_mapping(1, 50, tripod, 'blue_channel', message_type='cc')
-    device.register_mapping(1, 78, tripod, 'brightness_channel', message_type='cc')
-
-    # Rattan (Cync light) - RGB channels
-    device.register_mapping(1, 15, rattan, 'red_channel', message_type='cc')
-    device.register_mapping(1, 31, rattan, 'green_channel', message_type='cc')
-    device.register_mapping(1, 51, rattan, 'blue_channel', message_type='cc')
-    device.register_mapping(1, 79, rattan, 'brightness_channel', message_type='cc')
-
-    # Pebble Lamp (Cync light) - RGB channels
-    device.register_mapping(1, 16, pebble_lamp, 'red_channel', message_type='cc')
-    device.register_mapping(1, 32, pebble_lamp, 'green_channel', message_type='cc')
-    device.register_mapping(1, 52, pebble_lamp, 'blue_channel', message_type='cc')
-    device.register_mapping(1, 80, pebble_lamp, 'brightness_channel', message_type='cc')
-    # Jupiter (Cync light) - RGB channels
-    device.register_mapping(1, 17, jupiter, 'red_channel', message_type='cc')
-    device.register_mapping(1, 33, jupiter, 'green_channel', message_type='cc')
-    device.register_mapping(1, 53, jupiter, 'blue_channel', message_type='cc')  
-    device.register_mapping(1, 81, jupiter, 'brightness_channel', message_type='cc')
-    # Strawberry (Cync light) - RGB channels
-    device.register_mapping(1, 18, strawberry, 'red_channel', message_type='cc')
-    device.register_mapping(1, 34, strawberry, 'green_channel', message_type='cc')
-    device.register_mapping(1, 54, strawberry, 'blue_channel', message_type='cc')
-    device.register_mapping(1, 82, strawberry, 'brightness_channel', message_type='cc')
-    # Sunroom Lightbar - HS channels
-    device.register_mapping(1, 83, sunroom_lightbar, 'brightness_channel', message_type='cc')
-    device.register_mapping(1, 19, sunroom_lightbar, 'hue_channel', message_type='cc')
-    device.register_mapping(1, 35, sunroom_lightbar, 'saturation_channel', message_type='cc')
-
-
-
-
-    print("🔧 Setting up INSTANT FEEDBACK switches...")
-    
-    # Create switches with ultra-fast LED feedback
-    wavy_wub_switch, wavy_wub_feedback = create_instant_feedback_system(
-        entity_id='switch.wavy_wub',
-        client=homeassistant_client,
-        controller=device,
-        channel=1,
-        note=36  # Note 36 (C2)
-    )
-    
-    sunrise_switch, sunrise_feedback = create_instant_feedback_system(
-        entity_id='switch.sunrise_lamp',
-        client=homeassistant_client,
-        controller=device,
-        channel=1,
-        note=37  # Note 37 (C#2)
-    )
-    
-    lanterns_switch, lanterns_feedback = create_instant_feedback_system(
-        entity_id='switch.lanterns',
-        client=homeassistant_client,
-        controller=device,
-        channel=1,
-        note=38  # Note 38 (D2)
-    )
-
-    print("🔧 Setting up INSTANT FEEDBACK light toggles...")
-    
-    # Create light toggle with same instant feedback behavior
-    office_orb_switch, office_orb_feedback = create_instant_light_toggle(
-        entity_id='light.office_orb',
-        client=homeassistant_client,
-        controller=device,
-        channel=1,
-        note=40  # Note 40 (E1) as requested
-    )
-
-    # Create light toggle for Rice Planet
-    rice_planet_switch, rice_planet_feedback = create_instant_light_toggle(
-        entity_id='light.rice_planet',
-        client=homeassistant_client,
-        controller=device,
-        channel=1,
-        note=41  # Note 41 (F1)
-    )
-
-        # Create light toggle with same instant feedback behavior
-    akari_table_lamp_switch, akari_table_lamp_feedback = create_instant_light_toggle(
-        entity_id='light.akari_table_lamp',
-        client=homeassistant_client,
-        controller=device,
-        channel=1,
-        note=42
-    )  # Note 42 (F#1)
-    
-
-    # Register NOTE mappings for switches
-    print("🔧 Registering instant feedback switch mappings...")
-    device.register_mapping(1, 36, wavy_wub_switch, message_type='note')
-    device.register_mapping(1, 37, sunrise_switch, message_type='note')
-    device.register_mapping(1, 38, lanterns_switch, message_type='note')
-    device.register_mapping(1, 40, office_orb_switch, message_type='note')
-    device.register_mapping(1, 41, rice_planet_switch, message_type='note')  
-    device.register_mapping(1, 42, akari_table_lamp_switch, message_type='note')  
-
-    # Register other switches (if you have more)
-    # Add more switch mappings as needed...
-
-    # Register feedback systems
-    if midi_config.get_output_port():
-        print("🔄 Registering LED feedback systems...")
-        device.register_feedback(wavy_wub_feedback)
-        device.register_feedback(sunrise_feedback)
-        device.register_feedback(lanterns_feedback)
-        device.register_feedback(office_orb_feedback)
-        device.register_feedback(akari_table_lamp_feedback)
-        device.register_feedback(rice_planet_feedback)
+    device.register_mappings([
+        # Lightbar - HS channels
+        (1, 77, lightbar, 'brightness_channel'),
+        (1, 13, lightbar, 'hue_channel'),
+        (1, 29, lightbar, 'saturation_channel'),
+        # Tripod (Cync light) - RGB channels
+        (1, 14, tripod, 'red_channel'),
+        (1, 30, tripod, 'green_channel'),
+        (1, 50, tripod, 'blue_channel'),
+        (1, 78, tripod, 'brightness_channel'),
+        # Rattan (Cync light) - RGB channels
+        (1, 15, rattan, 'red_channel'),
+        (1, 31, rattan, 'green_channel'),
+        (1, 51, rattan, 'blue_channel'),
+        (1, 79, rattan, 'brightness_channel'),
+        # Pebble Lamp (Cync light) - RGB channels
+        (1, 16, pebble_lamp, 'red_channel'),
+        (1, 32, pebble_lamp, 'green_channel'),
+        (1, 52, pebble_lamp, 'blue_channel'),
+        (1, 80, pebble_lamp, 'brightness_channel'),
+        # Jupiter (Cync light) - RGB channels
+        (1, 17, jupiter, 'red_channel'),
+        (1, 33, jupiter, 'green_channel'),
+        (1, 53, jupiter, 'blue_channel'),
+        (1, 81, jupiter, 'brightness_channel'),
+        # Strawberry (Cync light) - RGB channels
+        (1, 18, strawberry, 'red_channel'),
+        (1, 34, strawberry, 'green_channel'),
+        (1, 54, strawberry, 'blue_channel'),
+        (1, 82, strawberry, 'brightness_channel'),
+        # Sunroom Lightbar - HS channels
+        (1, 83, sunroom_lightbar, 'brightness_channel'),
+        (1, 19, sunroom_lightbar, 'hue_channel'),
+        (1, 35, sunroom_lightbar, 'saturation_channel'),
+    ])
+
+
+
+
+    print("🔧 Setting up INSTANT FEEDBACK switches and light toggles...")
+
+    # (entity_id, note, factory) - add new instant-feedback buttons here
+    SWITCH_TABLE = [
+        ('switch.wavy_wub',        36, create_instant_feedback_system),  # Note 36 (C2)
+        ('switch.sunrise_lamp',    37, create_instant_feedback_system),  # Note 37 (C#2)
+        ('switch.lanterns',        38, create_instant_feedback_system),  # Note 38 (D2)
+        ('light.office_orb',       40, create_instant_light_toggle),     # Note 40 (E2)
+        ('light.rice_planet',      41, create_instant_light_toggle),     # Note 41 (F2)
+        ('light.akari_table_lamp', 42, create_instant_light_toggle),     # Note 42 (F#2)
+    ]
+
+    has_output = bool(midi_config.get_output_port())
+    for entity_id, note, factory in SWITCH_TABLE:
+        switch, feedback = factory(
+            entity_id=entity_id,
+            client=homeassistant_client,
+            controller=device,
+            channel=1,
+            note=note,
+            state_cache=state_cache
+        )
+        device.register_mapping(1, note, switch, message_type='note')
+        if has_output:
+            device.register_feedback(feedback)
+            state_listener.register(entity_id, feedback.on_state_change)
+
+    # Falls back to polling automatically when websocket-client is
+    # not installed or the connection drops
+    state_listener.start()
+
+    if has_output:
         print("✅ Ultra-fast LED feedback configured")
     else:
         print("⚠️  No output port - LED feedback disabled")
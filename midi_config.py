@@ -2,14 +2,34 @@
 
 import json
 import os
+import time
 from typing import Optional, Tuple
 import mido
 
+# Select the rtmidi backend explicitly: its native reader thread drives
+# the callback-based input path with no polling quantum. Every entry
+# script goes through this module, so the choice applies everywhere.
+try:
+    mido.set_backend('mido.backends.rtmidi')
+except Exception:
+    pass  # unavailable - stay on mido's default backend
+
 CONFIG_FILE = "midi_config.json"
 
 class MidiConfig:
     """MIDI Configuration Manager"""
-    
+
+    # Parsed config shared across instances and invalidated by file
+    # mtime - several entry points construct a MidiConfig at startup
+    # and re-reading the JSON each time is wasted disk I/O
+    _cached_config = None
+    _cached_mtime = 0.0
+
+    # Port enumeration round-trips into the OS MIDI layer, so the name
+    # lists are cached briefly; topology changes rarely
+    _cached_ports = (None, None, 0.0)
+    _PORTS_TTL = 1.0
+
     def __init__(self):
         self.input_port = None
         self.output_port = None
@@ -24,9 +44,14 @@ class MidiConfig:
             return False
         
         try:
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-            
+            cls = type(self)
+            mtime = os.path.getmtime(CONFIG_FILE)
+            if cls._cached_config is None or mtime != cls._cached_mtime:
+                with open(CONFIG_FILE, 'r') as f:
+                    cls._cached_config = json.load(f)
+                cls._cached_mtime = mtime
+            config = cls._cached_config
+
             self.input_port = config.get('midi_input_port')
             self.output_port = config.get('midi_output_port')
             
@@ -50,13 +75,23 @@ class MidiConfig:
         """Get configured output port"""
         return self.output_port if self.config_loaded else None
     
+    @classmethod
+    def _get_port_names(cls):
+        """Enumerate MIDI ports, cached for a short window"""
+        inputs, outputs, fetched_at = cls._cached_ports
+        now = time.monotonic()
+        if inputs is None or now - fetched_at > cls._PORTS_TTL:
+            inputs = mido.get_input_names()
+            outputs = mido.get_output_names()
+            cls._cached_ports = (inputs, outputs, now)
+        return inputs, outputs
+
     def validate_ports(self) -> bool:
         """Validate that configured ports are still available"""
         if not self.config_loaded:
             return False
-        
-        available_inputs = mido.get_input_names()
-        available_outputs = mido.get_output_names()
+
+        available_inputs, available_outputs = self._get_port_names()
         
         if self.input_port not in available_inputs:
             print(f"❌ Configured input port '{self.input_port}' is not available!")
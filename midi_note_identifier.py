@@ -16,16 +16,59 @@ NOTE_NAMES = [
     'C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B'
 ]
 
+# Message types we never display - clock alone can arrive at hundreds
+# of messages per second, so the skip test must be a hash lookup
+SKIP_TYPES = frozenset({'active_sensing', 'clock', 'start', 'stop', 'continue'})
+
+# Formatted lines accumulate here and go out in batches - one write
+# per burst instead of one per message, so terminal I/O cannot stall
+# the receive loop during a fast knob sweep
+BUF = []
+_last_flush = 0.0
+
+# Per-type line templates with the padded label baked in - the hot
+# formatting path is one format_map instead of rebuilding the label
+# with replace/title plus several f-strings per message
+TEMPLATES = {
+    'note_on':        "[{time}] Ch.{channel:2d} | Note On      | Note: {note:12} | Vel: {velocity:3d} | {description}",
+    'note_off':       "[{time}] Ch.{channel:2d} | Note Off     | Note: {note:12} | Vel: {velocity:3d} | {description}",
+    'control_change': "[{time}] Ch.{channel:2d} | Control Change | CC: {cc:3d}        | Val: {value:3d} | {description}",
+}
+
+# Messages within the same second share one formatted timestamp
+_ts_cache = (0, '')
+
+def _timestamp():
+    global _ts_cache
+    now = int(time.time())
+    if now != _ts_cache[0]:
+        _ts_cache = (now, time.strftime('%H:%M:%S'))
+    return _ts_cache[1]
+
+def flush_output(force=False):
+    """Write buffered lines once the batch is big or old enough"""
+    global _last_flush
+    now = time.monotonic()
+    if not force and len(BUF) < 64 and now - _last_flush < 0.05:
+        return
+    if BUF:
+        sys.stdout.write('\n'.join(BUF) + '\n')
+        sys.stdout.flush()
+        BUF.clear()
+    _last_flush = now
+
+# All 128 note names precomputed once - note_to_name runs on every
+# note message and again during summary aggregation
+NOTE_NAME_TABLE = tuple(f"{NOTE_NAMES[n % 12]}{(n // 12) - 1}" for n in range(128))
+
 def note_to_name(note_number):
     """Convert MIDI note number to note name (e.g., 60 -> C4)"""
-    octave = (note_number // 12) - 1
-    note_name = NOTE_NAMES[note_number % 12]
-    return f"{note_name}{octave}"
+    return NOTE_NAME_TABLE[note_number]
 
 def format_message_info(msg):
     """Format MIDI message information for display"""
     info = {
-        'time': time.strftime('%H:%M:%S'),
+        'time': _timestamp(),
         'channel': msg.channel + 1,  # Convert to 1-based
         'type': msg.type
     }
@@ -73,23 +116,21 @@ def format_message_info(msg):
     return info
 
 def print_message(info):
-    """Print formatted MIDI message"""
-    timestamp = info['time']
-    channel = info['channel']
-    msg_type = info['type'].replace('_', ' ').title()
-    
-    if info['type'] in ['note_on', 'note_off']:
-        print(f"[{timestamp}] Ch.{channel:2d} | {msg_type:12} | Note: {info['note']:12} | Vel: {info['velocity']:3d} | {info['description']}")
-    elif info['type'] == 'control_change':
-        print(f"[{timestamp}] Ch.{channel:2d} | {msg_type:12} | CC: {info['cc']:3d}        | Val: {info['value']:3d} | {info['description']}")
+    """Buffer one formatted MIDI message line for the next flush"""
+    template = TEMPLATES.get(info['type'])
+    if template is not None:
+        BUF.append(template.format_map(info))
     else:
-        # Handle other message types
+        # Rare message types take the generic path
+        timestamp = info['time']
+        channel = info['channel']
+        msg_type = info['type'].replace('_', ' ').title()
         details = []
         for key, value in info.items():
             if key not in ['time', 'channel', 'type', 'description']:
                 details.append(f"{key}: {value}")
         detail_str = " | ".join(details)
-        print(f"[{timestamp}] Ch.{channel:2d} | {msg_type:12} | {detail_str:20} | {info.get('description', '')}")
+        BUF.append(f"[{timestamp}] Ch.{channel:2d} | {msg_type:12} | {detail_str:20} | {info.get('description', '')}")
 
 def print_summary(message_counts):
     """Print summary of captured messages"""
@@ -166,24 +207,36 @@ def main():
     
     try:
         with midi_config.open_input() as inport:
-            for msg in inport:
+            while True:
+                msg = inport.poll()
+                if msg is None:
+                    # Port idle - push out any lines still below the
+                    # batch thresholds so a lone keypress shows up
+                    # immediately instead of riding the next event
+                    flush_output(force=True)
+                    time.sleep(0.01)
+                    continue
+
                 # Skip active sensing and clock messages (too noisy)
-                if msg.type in ['active_sensing', 'clock', 'start', 'stop', 'continue']:
+                if msg.type in SKIP_TYPES:
                     continue
-                
+
                 info = format_message_info(msg)
                 print_message(info)
-                
+                flush_output()
+
                 # Store for summary
                 message_counts[msg.type].append(info)
-                
+
     except KeyboardInterrupt:
+        flush_output(force=True)
         print("\n\n🛑 Stopping MIDI capture...")
-        
+
     except Exception as e:
+        flush_output(force=True)
         print(f"\n❌ Error: {e}")
         return
-    
+
     # Print summary
     print_summary(message_counts)
     
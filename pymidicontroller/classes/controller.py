@@ -1,26 +1,26 @@
 # controller.py - Complete optimized controller with Note and CC support
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
+from heapq import heappush, heappop
 from time import time, sleep
 import mido
+import queue
 import sys
+import threading
 
 from pymidicontroller.extensions import common
 from midi_config import MidiConfig
 
-@dataclass()
+@dataclass(slots=True)
 class ControlClass:
     """Midi control class values - supports both CC and Note"""
     channel: int
     control: int = None      # For CC messages
-    note: int = None         # For Note messages  
+    note: int = None         # For Note messages
     target: all = None
     data: all = 'value'
     message_type: str = 'cc' # 'cc' or 'note'
-    
-    value: float = 0
-    lower_left: int = 0
-    upper_right: int = 127
 
 @dataclass
 class ControllerExtension:
@@ -34,7 +34,7 @@ class ControllerExtension:
     min_value: int = 0
     max_value: int = 255
 
-    def __post_init__(self):    
+    def __post_init__(self):
         execute_function_exists = "execute" in dir(self)
         if not execute_function_exists:
             import sys; sys.exit(f"{type(self)} requires an 'execute' function.")
@@ -43,10 +43,25 @@ class ControllerExtension:
         if not update_function_exists:
             import sys; sys.exit(f"{type(self)} requires an 'update' function.")
 
+        # Scheduling state lives in plain attributes - invoke() runs per
+        # target per tick and attribute loads beat metadata dict lookups.
+        # A class-level update_frequency (subclass override) wins over
+        # the metadata default; set_metadata keeps both in sync.
+        default_frequency = getattr(self, 'update_frequency', None)
+        if default_frequency is None:
+            default_frequency = self.metadata.get('update_frequency', 1)
+        self.update_frequency = default_frequency
+        self.last_exec_time = self.metadata.get('last_exec_time', 0)
+
     def set_attribute(self, key, value):
         return self._set_value_in_dict(self.attributes, key, value)
 
     def set_metadata(self, key, value):
+        # Mirror the scheduling keys into the attributes invoke() reads
+        if key == 'update_frequency':
+            self.update_frequency = value
+        elif key == 'last_exec_time':
+            self.last_exec_time = value
         return self._set_value_in_dict(self.metadata, key, value)
 
     def get_attribute(self, key):
@@ -71,16 +86,14 @@ class ControllerExtension:
     def update(self, attribute, value):
         return self.set_attribute(attribute, value)
 
-    def invoke(self):
-        current_time = time()
-        last_post_time = self.get_metadata('last_exec_time')
-        update_frequency = self.get_metadata('update_frequency')
-        time_check = current_time - last_post_time <= update_frequency
-        if not time_check:
-            target_execution = self.execute()
-            self.set_metadata('last_exec_time', current_time)
-            return target_execution
-        return False
+    def invoke(self, now=None):
+        if now is None:
+            now = time()
+        if now - self.last_exec_time <= self.update_frequency:
+            return False
+        target_execution = self.execute()
+        self.last_exec_time = now
+        return target_execution
 
 @dataclass()
 class Controller:
@@ -88,6 +101,7 @@ class Controller:
     name: str = None
     controls: list[ControlClass] = field(default_factory=list)
     feedback_extensions: list[ControllerExtension] = field(default_factory=list)
+    led_buffer: dict = field(default_factory=dict)
     update_rate: float = 0.005  # 200Hz for ultra-responsive performance
 
     is_connected: bool = False
@@ -97,6 +111,67 @@ class Controller:
 
     def __post_init__(self):
         """Load MIDI configuration on initialization"""
+        # LED sends happen on a dedicated thread so a blocking MIDI
+        # write never stalls the input-handling loop
+        self._led_event = threading.Event()
+        self._led_lock = threading.Lock()
+        self._sender_thread = None
+
+        # Inbound messages land here - either pushed by the backend's
+        # callback thread or drained from the port when the backend has
+        # no callback support
+        self._msg_queue = queue.SimpleQueue()
+        self._poll_input = True
+
+        # In callback mode nothing in the loop touches the port, so an
+        # unplugged device never raises - validate the configured ports
+        # on a slow timer instead (the enumeration itself is cached)
+        self._conn_check_interval = 2.0
+        self._last_conn_check = 0.0
+
+        # Dispatch indexes: one dict lookup per inbound message instead
+        # of a linear scan over every registered mapping
+        self._cc_map = {}
+        self._note_map = {}
+
+        # Unique targets live in a min-heap ordered by next-run time,
+        # so each pass pops only the targets that are actually due
+        # instead of time-gating every target every tick. The sequence
+        # number breaks ties so the heap never compares targets.
+        self._target_heap = []
+        self._heap_seq = 0
+        self._unique_target_ids = set()
+
+        # Latest-wins latch for CC values: a knob sweep emits hundreds
+        # of intermediate values but only the newest one per control
+        # matters, so updates coalesce here and drain at ~30 Hz.
+        # Notes (button presses) always dispatch immediately.
+        self._pending_cc = {}
+        self._cc_drain_interval = 1 / 30
+        self._last_cc_drain = 0.0
+
+        # Feedback invokes can hit Home Assistant - run them on a small
+        # pool so one slow response never stalls MIDI handling. The
+        # in-flight set stops a stalled extension from piling up work.
+        self._feedback_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='feedback')
+        self._inflight = set()
+
+        # Jump table for inbound dispatch: one dict lookup per message
+        # instead of an if/elif chain, and new message types only need
+        # a new entry here
+        self._handlers = {
+            'control_change': lambda m: self.update_control(m.channel, m.control, m.value),
+            'note_on': lambda m: self.update_note(m.channel, m.note, m.velocity),
+            # note_off always dispatches as velocity 0
+            'note_off': lambda m: self.update_note(m.channel, m.note, 0),
+        }
+
+        # Message templates for send_note/send_cc, built lazily per
+        # (channel, note/control) so repeat sends only mutate the
+        # velocity/value field instead of constructing a Message
+        self._note_templates = {}
+        self._cc_templates = {}
+
         self.midi_config = MidiConfig()
         if not self.midi_config.config_loaded:
             print("❌ MIDI configuration not loaded!")
@@ -118,6 +193,7 @@ class Controller:
             else:
                 print('⚠️  No MIDI output configured - LED feedback disabled')
             
+            self._start_sender()
             self.initialized = True
             self.is_connected = True
             print(f'🎛️  Controller ready!')
@@ -146,8 +222,50 @@ class Controller:
         else:
             cc = ControlClass(channel=channel, control=control_or_note, target=target, data=data, message_type='cc')
             print(f"✅ Registered CC mapping: Ch.{channel} CC.{control_or_note} → {type(target).__name__}")
-        
+
+        self._index_mapping(cc)
+
+    def _index_mapping(self, cc):
+        """Add one ControlClass to the list and the dispatch indexes"""
+        # Resolve the default once here so dispatch never has to
+        if cc.data is None:
+            cc.data = 'value'
+
         self.controls.append(cc)
+        if cc.message_type == 'note':
+            self._note_map[(cc.channel, cc.note)] = cc
+        else:
+            self._cc_map[(cc.channel, cc.control)] = cc
+
+        if id(cc.target) not in self._unique_target_ids:
+            self._unique_target_ids.add(id(cc.target))
+            # Due immediately - the first loop pass runs it and then
+            # reschedules at the target's own update_frequency
+            heappush(self._target_heap, (0.0, self._heap_seq, cc.target))
+            self._heap_seq += 1
+
+    def register_mappings(self, mappings):
+        """Register many mappings in one pass.
+
+        Each entry is (channel, control_or_note, target, data,
+        message_type); data defaults to None and message_type to 'cc'.
+        One list extend and one summary line instead of per-mapping
+        bookkeeping and prints."""
+        registered = 0
+        for entry in mappings:
+            channel, control_or_note, target = entry[:3]
+            data = entry[3] if len(entry) > 3 else None
+            message_type = entry[4] if len(entry) > 4 else 'cc'
+            if message_type == 'note':
+                cc = ControlClass(channel=channel, note=control_or_note,
+                                  target=target, data=data, message_type='note')
+            else:
+                cc = ControlClass(channel=channel, control=control_or_note,
+                                  target=target, data=data, message_type='cc')
+            self._index_mapping(cc)
+            registered += 1
+
+        print(f"✅ Registered {registered} mappings")
 
     def register_feedback(self, feedback_extension):
         """Register a feedback extension that will be executed in the main loop"""
@@ -158,26 +276,99 @@ class Controller:
         """Send MIDI Note On/Off message to control LEDs"""
         if self.output_device is None:
             return False
-        
+
         try:
+            templates = self._note_templates.get((channel, note))
+            if templates is None:
+                templates = (mido.Message('note_on', channel=channel-1, note=note, velocity=0),
+                             mido.Message('note_off', channel=channel-1, note=note, velocity=0))
+                self._note_templates[(channel, note)] = templates
+
             if velocity > 0:
-                msg = mido.Message('note_on', channel=channel-1, note=note, velocity=velocity)
+                msg = templates[0]
+                msg.velocity = velocity
             else:
-                msg = mido.Message('note_off', channel=channel-1, note=note, velocity=0)
-            
+                msg = templates[1]
+
             self.output_device.send(msg)
             return True
         except Exception as e:
             print(f"❌ Error sending MIDI Note (ch:{channel}, note:{note}, vel:{velocity}): {e}")
             return False
 
+    def queue_led(self, msg):
+        """Queue an LED note message for the sender thread.
+
+        Only the latest message per (channel, note) is kept, so several
+        updates to the same LED before the sender wakes collapse into
+        one send. The caller returns immediately - the actual MIDI
+        write happens on the sender thread."""
+        with self._led_lock:
+            self.led_buffer[(msg.channel, msg.note)] = msg
+        self._led_event.set()
+
+    def _start_sender(self):
+        """Start the LED sender thread (idempotent)"""
+        if self._sender_thread is None:
+            self._sender_thread = threading.Thread(target=self._drain_leds, daemon=True)
+            self._sender_thread.start()
+
+    def _drain_leds(self):
+        """Sender thread body: sleep until LEDs are queued, then flush"""
+        while True:
+            self._led_event.wait()
+            self._led_event.clear()
+            self.flush_leds()
+
+    def flush_leds(self):
+        """Send every queued LED update back-to-back in one pass"""
+        if not self.led_buffer:
+            return
+
+        with self._led_lock:
+            msgs = list(self.led_buffer.values())
+            self.led_buffer.clear()
+
+        if self.output_device is not None:
+            sent = 0
+            try:
+                # On the rtmidi backend, write the whole batch through the
+                # underlying port so one drain pays one lock/dispatch cost
+                rt_port = getattr(self.output_device, '_rt', None)
+                if rt_port is not None:
+                    send_message = rt_port.send_message
+                    for msg in msgs:
+                        send_message(msg.bytes())
+                        sent += 1
+                else:
+                    send = self.output_device.send
+                    for msg in msgs:
+                        send(msg)
+                        sent += 1
+            except Exception as e:
+                print(f"❌ Error flushing LED updates: {e}")
+                # Owners dedupe on the color they queued, so a dropped
+                # batch would leave LEDs stuck until the NEXT different
+                # color - put the unsent tail back and retry after a
+                # short pause. setdefault keeps any newer value queued
+                # meanwhile; latest-wins still holds.
+                sleep(0.1)
+                with self._led_lock:
+                    for msg in msgs[sent:]:
+                        self.led_buffer.setdefault((msg.channel, msg.note), msg)
+                self._led_event.set()
+
     def send_cc(self, channel, control, value):
         """Send MIDI Control Change message"""
         if self.output_device is None:
             return False
-        
+
         try:
-            msg = mido.Message('control_change', channel=channel-1, control=control, value=value)
+            msg = self._cc_templates.get((channel, control))
+            if msg is None:
+                msg = mido.Message('control_change', channel=channel-1, control=control, value=0)
+                self._cc_templates[(channel, control)] = msg
+            msg.value = value
             self.output_device.send(msg)
             return True
         except Exception as e:
@@ -185,76 +376,159 @@ class Controller:
             return False
 
     def update_control(self, channel, control, value):
-        """Handle CC messages"""
-        channel = channel + 1
-        for cc in self.get_controls():
-            if cc.message_type == 'cc' and cc.channel == channel and cc.control == control:
-                if cc.data == None:
-                    cc.data = 'value'
+        """Handle CC messages - the first value for a control goes out
+        immediately, the rest of the burst coalesces.
+
+        Switches here can be CC-mapped and edge-detect in update(), so
+        a press/release pair must never collapse into one value; only
+        follow-up values inside an already-open window are latched."""
+        key = (channel + 1, control)
+        cc = self._cc_map.get(key)
+        if cc is None:
+            return
+        if key in self._pending_cc:
+            # Mid-burst: only the newest value matters
+            self._pending_cc[key] = (cc, value)
+        else:
+            # First value in the window - deliver now and open the
+            # window (None marks it open with nothing latched yet)
+            cc.target.update(cc.data, value)
+            self._pending_cc[key] = None
+
+    def drain_cc_updates(self, now):
+        """Apply the latest latched CC value per control and close the
+        coalescing windows"""
+        if not self._pending_cc or now - self._last_cc_drain < self._cc_drain_interval:
+            return
+        pending = self._pending_cc
+        self._pending_cc = {}
+        for entry in pending.values():
+            if entry is not None:
+                cc, value = entry
                 cc.target.update(cc.data, value)
+        self._last_cc_drain = now
 
     def update_note(self, channel, note, velocity):
         """Handle Note On/Off messages"""
-        channel = channel + 1
-        for cc in self.get_controls():
-            if cc.message_type == 'note' and cc.channel == channel and cc.note == note:
-                if cc.data == None:
-                    cc.data = 'value'
-                cc.target.update(cc.data, velocity)
+        cc = self._note_map.get((channel + 1, note))
+        if cc is not None:
+            cc.target.update(cc.data, velocity)
+
+    def _enqueue(self, message):
+        """Backend callback: hand an inbound message to the main loop"""
+        self._msg_queue.put(message)
+
+    def _attach_callback(self, midi_device):
+        """Deliver inbound messages through the backend's callback thread
+        when supported; otherwise fall back to polling the port"""
+        try:
+            midi_device.callback = self._enqueue
+            self._poll_input = False
+        except (AttributeError, NotImplementedError, IOError):
+            self._poll_input = True
+            print("⚠️  MIDI backend has no callback support - polling instead")
+
+    def _dispatch(self, message):
+        """Route one inbound MIDI message to its mapping"""
+        handler = self._handlers.get(message.type)
+        if handler is not None:
+            handler(message)
+
+    def _invoke_feedback(self, feedback_ext, now):
+        """Pool task: run one feedback invoke with its own error guard"""
+        try:
+            feedback_ext.invoke(now)
+        except Exception as e:
+            print(f"❌ Error in feedback extension: {e}")
 
     def loop(self):
-        """Ultra-high performance main loop with 200Hz polling"""
+        """Event-driven main loop: blocks on the message queue and wakes
+        for inbound MIDI or the next extension pass"""
         midi_device = None
 
         while True:
             try:
-                self.check_connection()
                 while not self.is_connected:
                     midi_device = self.init()
                     if midi_device is None:
                         print("❌ Failed to connect to MIDI device. Retrying in 2 seconds...")
                         sleep(2)
-
-                # Handle incoming MIDI messages - PROCESS ALL for zero latency
-                for message in midi_device.iter_pending():
-                    formatted_message = vars(message)
-                    
-                    if formatted_message['type'] == 'control_change':
-                        control = formatted_message['control']
-                        value = formatted_message['value']
-                        channel = formatted_message['channel']
-                        self.update_control(channel, control, value)
-                    
-                    elif formatted_message['type'] in ['note_on', 'note_off']:
-                        note = formatted_message['note']
-                        velocity = formatted_message['velocity']
-                        channel = formatted_message['channel']
-                        # For note_off, set velocity to 0
-                        if formatted_message['type'] == 'note_off':
-                            velocity = 0
-                        self.update_note(channel, note, velocity)
-                
-                # Execute control extensions
-                ignore_list = []
-                for cc in self.get_controls():
-                    target = cc.target
-                    if target not in ignore_list:
-                        target.invoke()
-                        ignore_list.append(target)
-
-                # Execute feedback extensions
-                feedback_ignore_list = []
+                    else:
+                        self._attach_callback(midi_device)
+
+                # No per-tick port validation - polling-mode errors
+                # raise below, and the callback path is covered by the
+                # periodic check after the drain
+                # Sleep until the next MIDI message or the next
+                # scheduled target, whichever comes first. Pending CC
+                # values and feedback extensions still need the short
+                # tick, so only an otherwise idle loop sleeps longer.
+                timeout = self.update_rate
+                if not self._pending_cc and not self.feedback_extensions:
+                    heap = self._target_heap
+                    if heap:
+                        due_in = heap[0][0] - time()
+                        if due_in > timeout:
+                            timeout = min(due_in, 0.5)
+                    else:
+                        timeout = 0.5
+
+                try:
+                    # Drain everything pending without further waiting
+                    try:
+                        self._dispatch(self._msg_queue.get(timeout=timeout))
+                        while True:
+                            self._dispatch(self._msg_queue.get_nowait())
+                    except queue.Empty:
+                        pass
+
+                    # Polling fallback for backends without callbacks
+                    if self._poll_input and midi_device is not None:
+                        for message in midi_device.iter_pending():
+                            self._dispatch(message)
+                except OSError as e:
+                    print(f"⚠️  MIDI connection lost: {e}")
+                    self.is_connected = False
+                    self.initialized = False
+                    continue
+
+                # One timestamp for the whole extension pass
+                now = time()
+
+                # Periodic port check catches an unplugged device even
+                # when input arrives via the backend callback and the
+                # queue can never raise
+                if now - self._last_conn_check >= self._conn_check_interval:
+                    self._last_conn_check = now
+                    if not self.midi_config.validate_ports():
+                        print("⚠️  MIDI device disconnected")
+                        self.is_connected = False
+                        self.initialized = False
+                        continue
+
+                # Apply coalesced CC values before the targets run
+                self.drain_cc_updates(now)
+
+                # Run only the targets whose next-run time has passed,
+                # then push each one back with its own period. invoke()
+                # keeps its own gate, so a forced last_exec_time reset
+                # still runs early on the next pop.
+                heap = self._target_heap
+                while heap and heap[0][0] <= now:
+                    _, seq, target = heappop(heap)
+                    target.invoke(now)
+                    heappush(heap, (now + target.update_frequency, seq, target))
+
+                # Execute feedback extensions off-thread, skipping any
+                # that are still running from a previous pass
                 for feedback_ext in self.feedback_extensions:
-                    if feedback_ext not in feedback_ignore_list:
-                        try:
-                            feedback_ext.invoke()
-                            feedback_ignore_list.append(feedback_ext)
-                        except Exception as e:
-                            print(f"❌ Error in feedback extension: {e}")
-
-                # Ultra-fast loop for maximum responsiveness
-                sleep(self.update_rate)  # 5ms = 200Hz
-                
+                    key = id(feedback_ext)
+                    if key in self._inflight:
+                        continue
+                    self._inflight.add(key)
+                    future = self._feedback_pool.submit(self._invoke_feedback, feedback_ext, now)
+                    future.add_done_callback(lambda _f, key=key: self._inflight.discard(key))
+
             except KeyboardInterrupt:
                 print('\n🛑 Shutting down...')
                 self.cleanup()
@@ -2,43 +2,307 @@ from pymidicontroller.classes.controller import ControllerExtension
 from pymidicontroller.extensions.common import translate
 from dataclasses import dataclass
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import logging
+import random
+import threading
 import time
 
+logger = logging.getLogger(__name__)
+
+# (connect, read) timeout for every Home Assistant call - a hung
+# instance must never block the controller thread indefinitely
+REQUEST_TIMEOUT = (2.0, 5.0)
+
+try:
+    import websocket  # websocket-client - optional, enables push updates
+except ImportError:
+    websocket = None
+
+try:
+    import orjson  # optional - much faster serialization, emits bytes directly
+except ImportError:
+    orjson = None
+
+# MIDI values are bounded to 0..127, so the 0-255 / 0-360 / 0-100 maps
+# the light paths need are 128-entry tables indexed directly - no float
+# math or round() on the per-fader-move execute path
+BRIGHT_LUT = tuple(round(translate(v, 0, 127, 0, 255)) for v in range(128))
+HUE_LUT = tuple(round(translate(v, 0, 127, 0, 360)) for v in range(128))
+SAT_LUT = tuple(round(translate(v, 0, 127, 0, 100)) for v in range(128))
+
 @dataclass()
 class Client:
     uri: str
     token: str
 
+    def __post_init__(self):
+        # One keep-alive session shared by every call - polling at tick
+        # rates must not pay a fresh TCP handshake per request
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Bearer {self.token}',
+            'Content-Type': 'application/json'
+        })
+        # Two quick retries smooth over transient connection drops so a
+        # single failed call doesn't surface as a missed LED update
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20,
+                              max_retries=Retry(total=2, backoff_factor=0.1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
     def get_state(self, entity_id):
         """Get the current state of a Home Assistant entity"""
-        headers = {
-            'Authorization': f'Bearer {self.token}', 
-            'Content-Type': 'application/json'
-        }
         try:
-            response = requests.get(f'{self.uri}/api/states/{entity_id}', headers=headers)
+            response = self.session.get(f'{self.uri}/api/states/{entity_id}',
+                                        timeout=REQUEST_TIMEOUT)
             if response.status_code == 200:
                 data = response.json()
                 return data.get('state')
             else:
                 print(f"Error getting state for {entity_id}: {response.status_code}")
                 return None
+        except requests.Timeout:
+            print(f"Timeout getting state for {entity_id}")
+            return None
         except Exception as e:
             print(f"Exception getting state for {entity_id}: {e}")
             return None
-        
+
+    def get_state_conditional(self, entity_id, etag=None):
+        """Conditional per-entity fetch using If-None-Match.
+
+        Returns (state, etag, unchanged). On 304 Not Modified the body
+        is empty and JSON parsing is skipped entirely - unchanged is
+        True and the caller keeps its previous value."""
+        try:
+            headers = {'If-None-Match': etag} if etag else None
+            response = self.session.get(f'{self.uri}/api/states/{entity_id}',
+                                        headers=headers, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 304:
+                return None, etag, True
+            if response.status_code == 200:
+                data = response.json()
+                return data.get('state'), response.headers.get('ETag'), False
+            print(f"Error getting state for {entity_id}: {response.status_code}")
+        except requests.Timeout:
+            print(f"Timeout getting state for {entity_id}")
+        except Exception as e:
+            print(f"Exception getting state for {entity_id}: {e}")
+        return None, etag, False
+
+    def get_states(self):
+        """Get the states of ALL entities in one /api/states call"""
+        try:
+            response = self.session.get(f'{self.uri}/api/states',
+                                        timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                return response.json()
+            else:
+                print(f"Error getting states: {response.status_code}")
+                return None
+        except requests.Timeout:
+            print("Timeout getting states")
+            return None
+        except Exception as e:
+            print(f"Exception getting states: {e}")
+            return None
+
     def post_data(self, data, domain, service):
-        headers = {
-            'Authorization': f'Bearer {self.token}', 
-            'Content-Type': 'application/json'
-        }
-        print(f"Sending: {json.dumps(data)}")
-        response = requests.post(f'{self.uri}/api/services/{domain}/{service}', headers=headers, data=json.dumps(data))
+        # Lazy %-formatting: the payload is only stringified when DEBUG
+        # logging is actually enabled
+        logger.debug("Sending: %s", data)
+        url = f'{self.uri}/api/services/{domain}/{service}'
+        try:
+            # The session already carries Content-Type: application/json,
+            # so orjson's bytes output can go straight in as the body
+            if orjson is not None:
+                response = self.session.post(url, data=orjson.dumps(data),
+                                             timeout=REQUEST_TIMEOUT)
+            else:
+                response = self.session.post(url, json=data, timeout=REQUEST_TIMEOUT)
+        except requests.Timeout:
+            print(f"Timeout calling {domain}/{service}")
+            return False
         if response.status_code != 200:
             print(f"Error: {response.status_code} - {response.text}")
         return response.status_code == 200
-    
+
+
+class StatesCache:
+    """Short-TTL cache that deduplicates get_state calls across many
+    feedback extensions sharing one Client.
+
+    Each extension polling the same entity within the TTL window gets the
+    cached answer instead of its own HTTP round-trip. refresh_all() can
+    amortize N per-entity requests into a single /api/states call."""
+
+    def __init__(self, client, ttl=0.05):
+        self.client = client
+        self.ttl = ttl
+        self._states = {}
+        self._expires = {}
+        self._etags = {}
+        # Bumped whenever a stored state actually changes value -
+        # consumers can compare one int instead of the state strings
+        self._versions = {}
+        # The WebSocket listener pushes from its own thread while the
+        # controller loop polls - serialize the bulk refresh so both
+        # don't issue overlapping /api/states calls
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+
+    def get(self, entity_id):
+        """Get an entity state, hitting Home Assistant only when stale.
+
+        A stale entry triggers one bulk refresh, so N extensions polling
+        in the same tick cost a single /api/states round-trip instead of
+        N per-entity requests."""
+        if time.monotonic() < self._expires.get(entity_id, 0):
+            return self._states.get(entity_id)
+
+        if self.refresh_all() and time.monotonic() < self._expires.get(entity_id, 0):
+            return self._states.get(entity_id)
+
+        # Bulk fetch failed (or the entity wasn't in it) - fall back to a
+        # conditional single-entity request; a 304 revalidates the cached
+        # value without any JSON parsing
+        state, etag, unchanged = self.client.get_state_conditional(
+            entity_id, self._etags.get(entity_id))
+        if unchanged:
+            self._expires[entity_id] = time.monotonic() + self.ttl
+            return self._states.get(entity_id)
+        if state is not None:
+            self._store(entity_id, state)
+            self._etags[entity_id] = etag
+            self._expires[entity_id] = time.monotonic() + self.ttl
+        return state
+
+    def _store(self, entity_id, state):
+        """Store a state, bumping its version only on a real change"""
+        if self._states.get(entity_id) != state:
+            self._versions[entity_id] = self._versions.get(entity_id, 0) + 1
+        self._states[entity_id] = state
+
+    def version(self, entity_id):
+        """Monotonic change counter for an entity's cached state"""
+        return self._versions.get(entity_id, 0)
+
+    def refresh_all(self):
+        """Refresh every entity in one bulk /api/states call"""
+        with self._refresh_lock:
+            # Threads that queued behind an in-flight refresh would
+            # each repeat the fetch - if another thread refreshed
+            # within the TTL while we waited, its data is still fresh
+            now = time.monotonic()
+            if now - self._last_refresh < self.ttl:
+                return True
+
+            all_states = self.client.get_states()
+            if not all_states:
+                return False
+
+            expires = time.monotonic() + self.ttl
+            for entry in all_states:
+                entity_id = entry['entity_id']
+                self._store(entity_id, entry['state'])
+                self._expires[entity_id] = expires
+            self._last_refresh = time.monotonic()
+            return True
+
+    def push(self, entity_id, state, fresh_for=3600):
+        """Store a pushed state (e.g. from the WebSocket listener).
+
+        Pushed entries get a long expiry so the polling path stops hitting
+        Home Assistant while the push source keeps them fresh."""
+        self._store(entity_id, state)
+        self._expires[entity_id] = time.monotonic() + fresh_for
+
+
+class StateEventListener:
+    """Background thread that subscribes to Home Assistant's WebSocket
+    state_changed events so state arrives as a push instead of a poll.
+
+    Pushed states land in the shared StatesCache (keeping the polling
+    fallback coherent) and are dispatched to any handler registered for
+    the entity. Requires the optional websocket-client package; when it
+    is missing, start() reports failure and callers keep polling."""
+
+    def __init__(self, client, states_cache):
+        self.client = client
+        self.states_cache = states_cache
+        self._handlers = {}
+        self._thread = None
+
+    def register(self, entity_id, handler):
+        """Register a callable(new_state) for an entity's state changes"""
+        self._handlers[entity_id] = handler
+
+    def start(self):
+        """Start the listener thread; returns False if unavailable"""
+        if websocket is None:
+            print("⚠️  websocket-client not installed - staying on polling")
+            return False
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return True
+
+    # A quiet socket is probed after this long; a dead one fails the
+    # ping and reaches the reconnect path instead of blocking forever
+    RECV_TIMEOUT = 30
+
+    def _run(self):
+        ws_uri = self.client.uri.replace('http', 'ws', 1) + '/api/websocket'
+        while True:
+            try:
+                ws = websocket.create_connection(ws_uri, timeout=self.RECV_TIMEOUT)
+                ws.recv()  # auth_required
+                ws.send(json.dumps({'type': 'auth', 'access_token': self.client.token}))
+                ws.recv()  # auth_ok
+                ws.send(json.dumps({'id': 1, 'type': 'subscribe_events', 'event_type': 'state_changed'}))
+                print("✅ Subscribed to Home Assistant state_changed events")
+
+                # Changes made while disconnected never arrive as
+                # events, and previously pushed entries carry a long
+                # expiry - one bulk refresh re-fetches everything and
+                # resets them to the normal TTL so polling covers any
+                # gap until fresh pushes take over again
+                self.states_cache.refresh_all()
+
+                while True:
+                    try:
+                        raw = ws.recv()
+                    except websocket.WebSocketTimeoutException:
+                        # Nothing for a while - make sure the socket is
+                        # still alive rather than silently dead
+                        ws.ping()
+                        continue
+                    message = json.loads(raw)
+                    if message.get('type') != 'event':
+                        continue
+                    data = message['event']['data']
+                    new_state = data.get('new_state') or {}
+                    self._dispatch(data['entity_id'], new_state.get('state'))
+            except Exception as e:
+                print(f"⚠️  WebSocket listener error: {e} - reconnecting in 2s")
+                time.sleep(2)
+
+    def _dispatch(self, entity_id, state):
+        if state is None:
+            return
+        self.states_cache.push(entity_id, state)
+
+        handler = self._handlers.get(entity_id)
+        if handler:
+            try:
+                handler(state)
+            except Exception as e:
+                print(f"Error in state handler for {entity_id}: {e}")
+
+
 @dataclass
 class FeedbackLight(ControllerExtension):
     """Monitors Home Assistant entity state and controls MIDI feedback LED using Note messages for toggle buttons"""
@@ -48,6 +312,16 @@ class FeedbackLight(ControllerExtension):
     midi_note: int = None
     controller_device: object = None
     led_color: str = 'red'
+    state_cache: StatesCache = None
+    update_frequency: float = 1.0
+
+    # Velocity values from the official Launch Control XL manual (page 4)
+    _COLOR_MAP = {
+        'red': 15,      # 0Fh - Red Full
+        'green': 60,    # 3Ch - Green Full
+        'amber': 63,    # 3Fh - Amber Full
+        'yellow': 62    # 3Eh - Yellow Full
+    }
 
     def __post_init__(self):
         super().__post_init__()
@@ -57,55 +331,89 @@ class FeedbackLight(ControllerExtension):
             import sys; sys.exit('No controller device registered for FeedbackLight')
         if self.midi_note is None:
             import sys; sys.exit('No MIDI Note specified for FeedbackLight')
-        
-        self.set_metadata('update_frequency', 1.0)  # Check every second
+
+        self.set_metadata('update_frequency', self.update_frequency)
         self.set_metadata('last_state', None)
-        self.set_metadata('last_check_time', 0)
+        # Stagger the first check by a random slice of the interval so
+        # N lights constructed in the same tick don't all poll Home
+        # Assistant at the same instant every cycle
+        self.set_metadata('last_check_time',
+                          time.monotonic() - random.uniform(0, self.update_frequency))
+
+        # The on-velocity for this LED never changes - resolve it once
+        self._on_velocity = self._COLOR_MAP.get(self.led_color, 15)
+
+        # Last cache version handled - when it matches, the whole state
+        # comparison block is skipped with one int test
+        self._last_seen_version = -1
+
+        # With a shared cache, N feedback LEDs polling in the same
+        # window cost one bulk /api/states call instead of N requests
+        if self.state_cache is not None:
+            self._get_state = self.state_cache.get
+        else:
+            self._get_state = self.client.get_state
 
     def _get_velocity_for_color(self, on=True):
         """Get the correct velocity value for LED color from Launch Control XL manual"""
-        if not on:
-            return 0  # LED off
-        
-        # Values from the official manual (page 4)
-        color_map = {
-            'red': 15,      # 0Fh - Red Full
-            'green': 60,    # 3Ch - Green Full  
-            'amber': 63,    # 3Fh - Amber Full
-            'yellow': 62    # 3Eh - Yellow Full
-        }
-        return color_map.get(self.led_color, 15)
+        return self._on_velocity if on else 0
 
     def execute(self):
-        current_time = time.time()
-        last_check = self.get_metadata('last_check_time')
-        
-        if current_time - last_check < self.get_metadata('update_frequency'):
+        # Bound methods resolved once - this body runs every tick
+        get_meta = self.get_metadata
+        set_meta = self.set_metadata
+
+        # Monotonic so NTP steps or DST jumps can neither stall polling
+        # nor fire a burst of catch-up checks
+        current_time = time.monotonic()
+        last_check = get_meta('last_check_time')
+
+        if current_time - last_check < get_meta('update_frequency'):
             return False
-            
+
         try:
-            current_state = self.client.get_state(self.entity_id)
-            last_state = self.get_metadata('last_state')
-            
+            current_state = self._get_state(self.entity_id)
+
+            # With a shared cache, an unchanged version means nothing
+            # to do - no metadata reads, no string comparison
+            cache = self.state_cache
+            version = None
+            if cache is not None:
+                version = cache.version(self.entity_id)
+                if version == self._last_seen_version:
+                    set_meta('last_check_time', current_time)
+                    return False
+
+            last_state = get_meta('last_state')
+
             if current_state != last_state and current_state is not None:
                 if current_state == 'on':
                     velocity = self._get_velocity_for_color(True)
                     success = self.controller_device.send_note(self.midi_channel, self.midi_note, velocity)
                     if success:
-                        print(f"✓ LED ON ({self.led_color}, Note {self.midi_note}) for {self.entity_id}")
+                        logger.info("✓ LED ON (%s, Note %s) for %s",
+                                    self.led_color, self.midi_note, self.entity_id)
                 else:
                     success = self.controller_device.send_note(self.midi_channel, self.midi_note, 0)
                     if success:
-                        print(f"✓ LED OFF (Note {self.midi_note}) for {self.entity_id}")
+                        logger.info("✓ LED OFF (Note %s) for %s",
+                                    self.midi_note, self.entity_id)
                 
                 if success:
-                    self.set_metadata('last_state', current_state)
-            
-            self.set_metadata('last_check_time', current_time)
-            
+                    set_meta('last_state', current_state)
+                    # Only a delivered update consumes the version - a
+                    # failed MIDI send keeps retrying on later ticks
+                    if version is not None:
+                        self._last_seen_version = version
+            elif version is not None:
+                # Nothing to send for this version
+                self._last_seen_version = version
+
+            set_meta('last_check_time', current_time)
+
         except Exception as e:
-            print(f"Error in FeedbackLight for {self.entity_id}: {e}")
-            self.set_metadata('last_check_time', current_time)
+            logger.error("Error in FeedbackLight for %s: %s", self.entity_id, e)
+            set_meta('last_check_time', current_time)
         
         return False
 
@@ -123,45 +431,68 @@ class Light(ControllerExtension):
         self.set_attribute('colour_mode', 'hs')
         self.set_metadata('init', True)
 
+    # A fader burst emits dozens of CC updates; holding the POST until
+    # the value has been stable this long turns a gesture into one
+    # request, at the cost of up to 50 ms of perceived lag - which the
+    # transition parameter smooths over anyway
+    DEBOUNCE_WINDOW = 0.05
+
     def update(self, attribute, value):
         self.set_metadata('post_flag', True)
+        self.set_metadata('dirty_since', time.monotonic())
         super().update(attribute, value)
 
     def execute(self):
-        if not self.get_metadata('init'):
+        # Bound methods resolved once for the whole body
+        get_meta = self.get_metadata
+        set_meta = self.set_metadata
+        get_attr = self.get_attribute
+
+        if not get_meta('init'):
             self.first_run()
-        
-        post_flag = self.get_metadata('post_flag')
+
+        post_flag = get_meta('post_flag')
         if post_flag:
-            transition = self.get_metadata('update_frequency')
-            brightness = translate(self.get_attribute('brightness_channel'),0,127,0,255)
+            # Still mid-gesture - wait for the value to settle. The
+            # flag stays set, so the final value always flushes on a
+            # later tick.
+            if time.monotonic() - get_meta('dirty_since') < self.DEBOUNCE_WINDOW:
+                return False
+            transition = get_meta('update_frequency')
 
             data = {}
-            data['brightness'] = round(brightness)
+            data['brightness'] = BRIGHT_LUT[get_attr('brightness_channel')]
             data['transition'] = transition
             data['entity_id'] = self.entity_id
 
-            colour_mode = self.get_attribute('colour_mode')
+            colour_mode = get_attr('colour_mode')
             if colour_mode == 'rgb':
-                red = translate(self.get_attribute('red_channel'),0,127,0,255)
-                green = translate(self.get_attribute('green_channel'),0,127,0,255)
-                blue = translate(self.get_attribute('blue_channel'),0,127,0,255)
                 data['rgb_color'] = [
-                    round(red), 
-                    round(green), 
-                    round(blue)
+                    BRIGHT_LUT[get_attr('red_channel')],
+                    BRIGHT_LUT[get_attr('green_channel')],
+                    BRIGHT_LUT[get_attr('blue_channel')]
                 ]
 
             elif colour_mode == 'hs':
-                hue = translate(self.get_attribute('hue_channel'),0,127,0,360)
-                saturation = translate(self.get_attribute('saturation_channel'),0,127,0,100)
                 data['hs_color'] = [
-                    round(hue), 
-                    round(saturation)
+                    HUE_LUT[get_attr('hue_channel')],
+                    SAT_LUT[get_attr('saturation_channel')]
                 ]
-                
+
+
+            # A knob wiggled back to its previous value produces the
+            # same payload - skip the round-trip entirely, the way
+            # CyncLight already does for brightness/color
+            key = (data['brightness'],
+                   tuple(data.get('rgb_color') or data.get('hs_color') or ()))
+            if key == get_meta('last_payload'):
+                set_meta('post_flag', False)
+                return False
+
             post_data = self.client.post_data(data, 'light', 'turn_on')
-            self.set_metadata('post_flag', not post_data)
+            set_meta('post_flag', not post_data)
+            if post_data:
+                set_meta('last_payload', key)
             return not post_data
         return False
 
@@ -184,26 +515,38 @@ class CyncLight(Light):
         self.set_attribute('colour_mode', 'rgb')
         self.set_metadata('last_brightness', 255)
         self.set_metadata('last_color', [255, 255, 255])
+        # Cync firmware wants a beat between the color and brightness
+        # commands; instead of sleeping on the loop thread, the
+        # brightness POST is deferred until this deadline passes
+        self._brightness_hold_until = 0.0
         
     def execute(self):
-        if not self.get_metadata('init'):
+        # Bound methods resolved once for the whole body
+        get_meta = self.get_metadata
+        set_meta = self.set_metadata
+        get_attr = self.get_attribute
+
+        if not get_meta('init'):
             self.first_run()
-        
-        post_flag = self.get_metadata('post_flag')
+
+        post_flag = get_meta('post_flag')
         if not post_flag:
             return False
-        
+
+        # Same debounce as Light - let the fader burst settle first
+        if time.monotonic() - get_meta('dirty_since') < self.DEBOUNCE_WINDOW:
+            return False
+
         # Get current values
-        brightness = translate(self.get_attribute('brightness_channel'), 0, 127, 0, 255)
-        red = translate(self.get_attribute('red_channel'), 0, 127, 0, 255)
-        green = translate(self.get_attribute('green_channel'), 0, 127, 0, 255)
-        blue = translate(self.get_attribute('blue_channel'), 0, 127, 0, 255)
-        
-        current_brightness = round(brightness)
-        current_color = [round(red), round(green), round(blue)]
-        
-        last_brightness = self.get_metadata('last_brightness')
-        last_color = self.get_metadata('last_color')
+        current_brightness = BRIGHT_LUT[get_attr('brightness_channel')]
+        current_color = [
+            BRIGHT_LUT[get_attr('red_channel')],
+            BRIGHT_LUT[get_attr('green_channel')],
+            BRIGHT_LUT[get_attr('blue_channel')]
+        ]
+
+        last_brightness = get_meta('last_brightness')
+        last_color = get_meta('last_color')
         
         # For Cync: Send color and brightness separately
         success = True
@@ -218,11 +561,16 @@ class CyncLight(Light):
             print(f"Cync: Setting color to {current_color}")
             success = self.client.post_data(color_data, 'light', 'turn_on')
             if success:
-                self.set_metadata('last_color', current_color)
-                time.sleep(0.1)  # Small delay between commands
-        
+                set_meta('last_color', current_color)
+                # Start the between-commands gap without blocking
+                self._brightness_hold_until = time.monotonic() + 0.1
+
         # Then send brightness separately if it changed
         if current_brightness != last_brightness and success:
+            if time.monotonic() < self._brightness_hold_until:
+                # Inside the gap - leave the flag set so a later tick
+                # sends brightness; other extensions run meanwhile
+                return False
             brightness_data = {
                 'entity_id': self.entity_id,
                 'brightness': current_brightness
@@ -231,74 +579,133 @@ class CyncLight(Light):
             print(f"Cync: Setting brightness to {current_brightness}")
             success = self.client.post_data(brightness_data, 'light', 'turn_on')
             if success:
-                self.set_metadata('last_brightness', current_brightness)
-        
-        self.set_metadata('post_flag', not success)
+                set_meta('last_brightness', current_brightness)
+
+        set_meta('post_flag', not success)
         return not success
 
 
+@dataclass
+class ServiceCallBatcher(ControllerExtension):
+    """Aggregates service calls so several switches toggled in the same
+    window cost one POST per (domain, service) instead of one each.
+
+    Home Assistant accepts entity_id as a list, so mashing N buttons in
+    one tick turns into a single round-trip. Register the batcher with
+    the controller (register_feedback) and it flushes on every pass;
+    switches constructed with batcher= queue into it instead of posting
+    themselves."""
+    client: Client = None
+
+    def __post_init__(self):
+        super().__post_init__()
+        if self.client is None:
+            import sys; sys.exit('No client registered for ServiceCallBatcher')
+        self.set_metadata('update_frequency', 0.01)
+        self._queued = {}
+        # Switches queue from the loop thread while flush runs on the
+        # feedback pool - swap the dict under a lock
+        self._lock = threading.Lock()
+
+    def queue(self, domain, service, entity_id):
+        """Queue one entity for the next flush"""
+        with self._lock:
+            self._queued.setdefault((domain, service), []).append(entity_id)
+
+    def flush(self):
+        """POST one grouped call per (domain, service) queued"""
+        with self._lock:
+            if not self._queued:
+                return True
+            queued = self._queued
+            self._queued = {}
+
+        all_ok = True
+        for (domain, service), entity_ids in queued.items():
+            # Single entity keeps the familiar scalar payload
+            payload = entity_ids[0] if len(entity_ids) == 1 else entity_ids
+            if not self.client.post_data({'entity_id': payload}, domain, service):
+                all_ok = False
+        return all_ok
+
+    def update(self, attribute, value):
+        pass  # nothing maps to the batcher directly
+
+    def execute(self):
+        return not self.flush()
+
+
 @dataclass
 class Switch(ControllerExtension):
     entity_id: str = None
     client: Client = None
+    batcher: ServiceCallBatcher = None
 
     def __post_init__(self):
         super().__post_init__()
         self.set_metadata('update_frequency', 0.005)
         if self.client is None:
             import sys; sys.exit('No client registered')
-        self.set_attribute('button_state', 0)
+        # Edge state as a plain attribute - update() runs per MIDI
+        # message, and an attribute load beats two dict round-trips
+        self._last_button_state = False
 
     def update(self, attribute, value):
-        last_button_state = self.get_attribute('button_state') or 0
-        button_state = 1 if value > 0 else 0
+        pressed = value > 0
 
         # Detect rising edge (press)
-        if last_button_state == 0 and button_state == 1:
+        if pressed and not self._last_button_state:
             self.set_metadata('post_flag', True)
 
-        self.set_attribute('button_state', button_state)
+        self._last_button_state = pressed
         super().update(attribute, value)
 
     def execute(self):
         if self.get_metadata('post_flag'):
+            self.set_metadata('post_flag', False)
+            if self.batcher is not None:
+                self.batcher.queue('switch', 'toggle', self.entity_id)
+                return False
             data = {'entity_id': self.entity_id}
             success = self.client.post_data(data, 'switch', 'toggle')
-            self.set_metadata('post_flag', False)
             return not success
         return False
-    
+
 @dataclass
 class ToggleSwitch(ControllerExtension):
     """Handles toggle note-based switches - simpler than momentary switches"""
     entity_id: str = None
     client: Client = None
+    batcher: ServiceCallBatcher = None
 
     def __post_init__(self):
         super().__post_init__()
         self.set_metadata('update_frequency', 0.1)  # Fast response for user actions
         if self.client is None:
             import sys; sys.exit('No client registered')
-        self.set_attribute('last_note_state', 0)
+        # Edge state as a plain attribute, same as Switch
+        self._last_note_state = False
 
     def update(self, attribute, value):
         # For toggle buttons, we get note on/off messages
         # Note on (value > 0) = button pressed down
         # Note off (value = 0) = button released
-        last_state = self.get_attribute('last_note_state') or 0
-        current_state = 1 if value > 0 else 0
+        pressed = value > 0
 
         # Only trigger on note ON (button press), not note OFF (release)
-        if last_state == 0 and current_state == 1:
+        if pressed and not self._last_note_state:
             self.set_metadata('post_flag', True)
 
-        self.set_attribute('last_note_state', current_state)
+        self._last_note_state = pressed
         super().update(attribute, value)
 
     def execute(self):
         if self.get_metadata('post_flag'):
+            self.set_metadata('post_flag', False)
+            if self.batcher is not None:
+                self.batcher.queue('switch', 'toggle', self.entity_id)
+                return False
             data = {'entity_id': self.entity_id}
             success = self.client.post_data(data, 'switch', 'toggle')
-            self.set_metadata('post_flag', False)
             return not success
         return False
\ No newline at end of file
@@ -5,12 +5,15 @@ from pymidicontroller.extensions import *
 from midi_config import load_midi_config
 from instant_feedback import create_instant_feedback_system
 from datetime import datetime
-import os
+import logging
 import time
-from dotenv import load_dotenv
+from env import api_key
 
-load_dotenv()
-api_key = os.getenv("API_KEY")
+api_key = api_key()
+
+# Extension log lines (LED feedback, service calls) come through the
+# logging module - show them at INFO here
+logging.basicConfig(level=logging.INFO, format='%(message)s')
 
 # Load MIDI configuration
 print("🎵 Loading MIDI configuration...")
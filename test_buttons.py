@@ -4,11 +4,13 @@ from pymidicontroller.classes.controller import Controller
 from pymidicontroller.extensions import *
 from midi_config import load_midi_config
 from datetime import datetime
-import os
-from dotenv import load_dotenv
+import logging
+from env import api_key
 
-load_dotenv()
-api_key = os.getenv("API_KEY")
+api_key = api_key()
+
+# Extension log lines come through the logging module - show them here
+logging.basicConfig(level=logging.INFO, format='%(message)s')
 
 # Load MIDI configuration
 print("🎵 Loading MIDI configuration...")